@@ -1,6 +1,100 @@
-from MatchPredictor import FootballPredictor
-import pandas as pd
+from MatchPredictor import FEATURE_VERSION, FootballPredictor
+import numpy as np
+import joblib
+import os
+import tempfile
 from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+
+def _load_saved_model(model_path: Path, key: dict) -> Optional[object]:
+    """
+    Load a saved model if it was trained for the given key.
+
+    A missing, truncated or unreadable file (e.g. pickled by an incompatible
+    scikit-learn version) is treated as a cache miss.
+
+    Args:
+        model_path: Path of the saved model
+        key: Data file and pipeline details the model must have been trained with
+
+    Returns:
+        The saved model, or None if it cannot be reused
+    """
+    if not model_path.exists():
+        return None
+    try:
+        saved = joblib.load(model_path)
+    except Exception:
+        return None
+    if not isinstance(saved, dict) or saved.get("key") != key:
+        return None
+    return saved["model"]
+
+
+def _save_model(model_path: Path, key: dict, model: object) -> None:
+    """
+    Save a model atomically, so an interrupted write never leaves a broken file behind.
+
+    Args:
+        model_path: Path to save the model to
+        key: Data file and pipeline details the model was trained with
+        model: Fitted model
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=model_path.parent, prefix=f"{model_path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        joblib.dump({"key": key, "model": model}, tmp_path, compress=3)
+        os.replace(tmp_path, model_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+@lru_cache(maxsize=4)
+def _get_fitted_predictor(data_path: str, mtime: float) -> FootballPredictor:
+    """
+    Build a predictor with its features prepared and its model trained.
+
+    The fitted model is also persisted next to the data file so that a fresh
+    process can skip training as long as the data file has not changed.
+
+    Args:
+        data_path: Path to the historical match data CSV or Parquet file
+        mtime: Modification time of the data file, used to invalidate caches
+
+    Returns:
+        FootballPredictor with a fitted model and prepared features
+    """
+    predictor = FootballPredictor(data_path)
+    predictor._prepared = predictor.prepare_features()
+
+    predictors = list(predictor.predictors)
+
+    # Reuse the model trained on this exact file and feature pipeline if one was saved
+    data_file = Path(data_path)
+    model_path = data_file.with_name(f"{data_file.name}.joblib")
+    key = {
+        "data_file": data_file.name,
+        "mtime": mtime,
+        "feature_version": FEATURE_VERSION,
+        "predictors": predictor.predictors,
+        "params": predictor.rf.get_params()
+    }
+    saved_model = _load_saved_model(model_path, key)
+
+    if saved_model is not None:
+        predictor.rf = saved_model
+    else:
+        predictor.rf.fit(
+            predictor._prepared[predictors].to_numpy(),
+            predictor._prepared['target'].to_numpy()
+        )
+        _save_model(model_path, key, predictor.rf)
+
+    return predictor
 
 
 def predict_match(team1: str, team2: str, data_path: str = "matches.csv") -> dict:
@@ -10,50 +104,26 @@ def predict_match(team1: str, team2: str, data_path: str = "matches.csv") -> dic
     Args:
         team1: Name of the home team
         team2: Name of the away team
-        data_path: Path to the historical match data CSV file
+        data_path: Path to the historical match data CSV or Parquet file
 
     Returns:
         Dictionary containing prediction details and win probabilities
     """
-    # Initialize predictor
-    predictor = FootballPredictor(data_path)
+    # Get a trained predictor, reused across calls for the same data file
+    predictor = _get_fitted_predictor(data_path, Path(data_path).stat().st_mtime)
+
+    # Build the feature vector for the new match, in the same order as the predictors
+    features = np.empty((1, len(predictor.predictors)), dtype=np.float64)
+    features[0, 0] = 1  # Code for home venue, assuming team1 is home team
+    features[0, 1] = predictor.opponent_code(team2)
+    features[0, 2] = 15  # Default to 3 PM kickoff
+    features[0, 3] = datetime.now().weekday()
 
-    # Prepare all features
-    prepared_data = predictor.prepare_features()
-
-    # Get the most recent data for both teams
-    team1_recent = prepared_data[prepared_data['team'] == team1].iloc[-1]
-    team2_recent = prepared_data[prepared_data['team'] == team2].iloc[-1]
-
-    # Create a new match entry for prediction
-    new_match = pd.DataFrame({
-        'date': datetime.now(),
-        'team': team1,
-        'opponent': team2,
-        'venue': 'Home',  # Assuming team1 is home team
-        'venue_code': 1,  # Code for home venue
-        'opp_code': prepared_data[prepared_data['team'] == team2]['opp_code'].iloc[0],
-        'hour': 15,  # Default to 3 PM kickoff
-        'day_code': datetime.now().weekday(),
-    }, index=[0])
-
-    # Copy rolling averages from most recent matches
-    for col in predictor.stat_columns:
-        new_match[f'{col}_rolling'] = team1_recent[f'{col}_rolling']
-
-    # Get feature columns in correct order
-    predictors = [
-                     "venue_code",
-                     "opp_code",
-                     "hour",
-                     "day_code"
-                 ] + [f"{col}_rolling" for col in predictor.stat_columns]
-
-    # Train model on all available data
-    predictor.rf.fit(prepared_data[predictors], prepared_data['target'])
+    # Rolling averages over the home team's most recent matches
+    features[0, 4:] = predictor.recent_averages(team1)
 
     # Make prediction
-    win_probability = predictor.rf.predict_proba(new_match[predictors])[0][1]
+    win_probability = predictor.rf.predict_proba(features)[0][1]
 
     # Return prediction details
     return {
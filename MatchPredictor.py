@@ -1,7 +1,70 @@
+from collections import deque
+from joblib import Memory
+import numpy as np
 import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
+import pyarrow as pa
+import pyarrow.compute as pc
+from pathlib import Path
+from numba import njit, prange
+from sklearn.ensemble import HistGradientBoostingClassifier
 from sklearn.metrics import accuracy_score, precision_score
-from typing import List, Tuple, Dict
+from typing import List, Optional, Sequence, Tuple, Dict
+
+# Bump whenever feature preparation changes so cached features and saved models are rebuilt
+FEATURE_VERSION = 1
+
+
+@njit("void(f8[:, :], i8[:], i8[:], i8, f8[:, :])", parallel=True, cache=True)
+def _rolling_mean_left(values, group_starts, group_ends, window, out):
+    """
+    Fill out with the mean of the previous window rows of each group.
+
+    Rows are expected to be sorted by group, with each group occupying the
+    slice group_starts[g]:group_ends[g]. Rows without a full window of
+    non-missing previous values are set to NaN.
+
+    Args:
+        values: 2D array of statistics, one row per match
+        group_starts: First row of each group
+        group_ends: One past the last row of each group
+        window: Number of previous rows to average
+        out: Preallocated array with the same shape as values
+    """
+    for g in prange(group_starts.shape[0]):
+        start = group_starts[g]
+        end = group_ends[g]
+
+        for j in range(values.shape[1]):
+            total = 0.0
+            count = 0
+
+            for i in range(start, end):
+                out[i, j] = total / window if count == window else np.nan
+
+                # Slide the window forward: add this row, drop the oldest one
+                if not np.isnan(values[i, j]):
+                    total += values[i, j]
+                    count += 1
+                if i - window >= start and not np.isnan(values[i - window, j]):
+                    total -= values[i - window, j]
+                    count -= 1
+
+
+def _group_boundaries(group_codes: np.ndarray, n_groups: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Locate the contiguous block of rows belonging to each group.
+
+    Args:
+        group_codes: Sorted integer group code of each row
+        n_groups: Number of distinct groups
+
+    Returns:
+        Tuple containing the first row and one past the last row of each group
+    """
+    group_ids = np.arange(n_groups)
+    group_starts = np.searchsorted(group_codes, group_ids, side="left").astype(np.int64)
+    group_ends = np.searchsorted(group_codes, group_ids, side="right").astype(np.int64)
+    return group_starts, group_ends
 
 
 class FootballPredictor:
@@ -12,12 +75,13 @@ class FootballPredictor:
         Args:
             data_path: Path to the CSV file containing match data
         """
-        self.rf = RandomForestClassifier(
-            n_estimators=50,
-            min_samples_split=10,
+        self.data_path = data_path
+        self.rf = HistGradientBoostingClassifier(
+            max_iter=100,
+            early_stopping=False,  # Holding out a validation split stops too early on this little data
             random_state=1
         )
-        self.matches = self._load_and_clean_data(data_path)
+        self._matches: Optional[pd.DataFrame] = None  # Loaded on first use
 
         # Define columns for rolling averages
         self.stat_columns = [
@@ -31,32 +95,71 @@ class FootballPredictor:
             "pkatt"  # Penalty Attempts
         ]
 
+        # Model features: basic match details plus rolling averages
+        self.predictors = (
+            "venue_code",
+            "opp_code",
+            "hour",
+            "day_code",
+            *[f"{col}_rolling" for col in self.stat_columns]
+        )
+
+        # Each team's latest matches and each opponent's opp_code, filled in by prepare_features
+        self._window = 3
+        self._recent_stats: Dict[str, deque] = {}
+        self._opponent_codes: Dict[str, int] = {}
+
         self.team_mappings = {
             "Brighton and Hove Albion": "Brighton",
             "Manchester United": "Manchester Utd",
             "Newcastle United": "Newcastle Utd",
+            "Sheffield United": "Sheffield Utd",
             "Tottenham Hotspur": "Tottenham",
+            "West Bromwich Albion": "West Brom",
             "West Ham United": "West Ham",
             "Wolverhampton Wanderers": "Wolves"
         }
 
-    def _load_and_clean_data(self, data_path: str) -> pd.DataFrame:
+    @property
+    def matches(self) -> pd.DataFrame:
+        """
+        Cleaned match data, loaded from data_path the first time it is needed.
+        """
+        if self._matches is None:
+            self._matches = self._load_and_clean_data(self.data_path)
+        return self._matches
+
+    @matches.setter
+    def matches(self, matches: pd.DataFrame) -> None:
+        self._matches = matches
+
+    @staticmethod
+    def _load_and_clean_data(data_path: str) -> pd.DataFrame:
         """
         Load and preprocess the match data.
 
+        Parquet files written by the scraper already have parsed dates and
+        kickoff hours, so only CSV files need those conversions.
+
         Args:
-            data_path: Path to the CSV file
+            data_path: Path to the CSV or Parquet file
 
         Returns:
             Cleaned DataFrame with encoded categorical variables
         """
-        matches = pd.read_csv(data_path, index_col=0)
+        if Path(data_path).suffix == ".parquet":
+            matches = pd.read_parquet(data_path)
+        else:
+            matches = pd.read_csv(data_path, index_col=0, dtype={"time": pd.ArrowDtype(pa.string())})
+            matches["date"] = pd.to_datetime(matches["date"])
+
+            # Take the hour from "HH:MM" with Arrow's compute kernels rather than per-row Python string calls
+            kickoff_parts = pc.split_pattern(pa.array(matches["time"]), ":")
+            matches["hour"] = pc.cast(pc.list_element(kickoff_parts, 0), pa.int16()).to_numpy()
 
-        # Convert and encode features
-        matches["date"] = pd.to_datetime(matches["date"])
+        # Encode features
         matches["venue_code"] = matches["venue"].astype("category").cat.codes
         matches["opp_code"] = matches["opponent"].astype("category").cat.codes
-        matches["hour"] = matches["time"].str.replace(":.+", "", regex=True).astype("int")
         matches["day_code"] = matches["date"].dt.dayofweek
 
         # Create target variable (1 for win, 0 for draw/loss)
@@ -64,45 +167,120 @@ class FootballPredictor:
 
         return matches
 
-    def calculate_rolling_averages(self, group: pd.DataFrame, window: int = 3) -> pd.DataFrame:
+    def prepare_features(self, window: int = 3) -> pd.DataFrame:
         """
-        Calculate rolling averages for specified statistics.
+        Prepare feature set including rolling averages for all teams.
+
+        Until the match data has been loaded, features are read from a disk
+        cache that is only recomputed when the data file changes.
 
         Args:
-            group: DataFrame containing team's matches
             window: Number of matches to use for rolling average
 
         Returns:
-            DataFrame with added rolling average columns
+            DataFrame with all features prepared for modeling
         """
-        group = group.sort_values("date")
-        new_cols = [f"{col}_rolling" for col in self.stat_columns]
+        if self._matches is None:
+            matches = _prepare(
+                self.data_path,
+                Path(self.data_path).stat().st_mtime,
+                tuple(self.stat_columns),
+                window,
+                FEATURE_VERSION
+            )
+        else:
+            # Loaded data may have been modified, so compute from it directly
+            matches = self._compute_features(self._matches, self.stat_columns, window)
+
+        # Keep each team's latest matches so rolling averages for new fixtures need no recompute
+        team_codes, teams = pd.factorize(matches["team"], sort=True)
+        group_starts, group_ends = _group_boundaries(team_codes, len(teams))
+        stats = matches[self.stat_columns].to_numpy(dtype=np.float64)
+
+        self._window = window
+        self._recent_stats = {
+            team: deque(stats[max(start, end - window):end], maxlen=window)
+            for team, start, end in zip(teams, group_starts, group_ends)
+        }
 
-        rolling_stats = group[self.stat_columns].rolling(
-            window,
-            closed='left'
-        ).mean()
+        # opp_code encodes the opponent's name, so keep the same category codes for lookups
+        opponents = matches["opponent"].astype("category").cat.categories
+        self._opponent_codes = {name: code for code, name in enumerate(opponents)}
 
-        group[new_cols] = rolling_stats
-        return group.dropna(subset=new_cols)
+        return matches
 
-    def prepare_features(self) -> pd.DataFrame:
+    @staticmethod
+    def _compute_features(matches: pd.DataFrame, stat_columns: List[str], window: int) -> pd.DataFrame:
         """
-        Prepare feature set including rolling averages for all teams.
+        Compute rolling average features for all teams, sorted by team and date.
+
+        Args:
+            matches: Cleaned match data
+            stat_columns: Statistics to compute rolling averages for
+            window: Number of matches to use for rolling average
 
         Returns:
             DataFrame with all features prepared for modeling
         """
-        # Calculate rolling averages for each team
-        matches_rolling = self.matches.groupby("team").apply(
-            lambda x: self.calculate_rolling_averages(x)
-        )
+        matches = matches.sort_values(["team", "date"], ignore_index=True)
+        new_cols = [f"{col}_rolling" for col in stat_columns]
+
+        # Locate each team's contiguous block of rows
+        team_codes, teams = pd.factorize(matches["team"], sort=True)
+        group_starts, group_ends = _group_boundaries(team_codes, len(teams))
+
+        # Rolling averages of each team's previous matches, excluding the current one
+        stats = matches[stat_columns].to_numpy(dtype=np.float64)
+        rolling_stats = np.empty_like(stats)
+        _rolling_mean_left(stats, group_starts, group_ends, window, rolling_stats)
 
-        # Reset index for easier handling
-        matches_rolling = matches_rolling.droplevel('team')
-        matches_rolling.index = range(matches_rolling.shape[0])
+        # Early matches without a full window keep NaN averages, which the model handles natively
+        matches[new_cols] = rolling_stats
 
-        return matches_rolling
+        # Features stay float64, the dtype HistGradientBoostingClassifier validates X to
+        matches["target"] = matches["target"].astype(np.int8)
+
+        return matches
+
+    def opponent_code(self, team: str) -> int:
+        """
+        Code used for a team in the opp_code feature when it is the opponent.
+
+        Args:
+            team: Name of the team, as it appears in the team column
+
+        Returns:
+            The team's opp_code
+        """
+        return self._opponent_codes[self.team_mappings.get(team, team)]
+
+    def recent_averages(self, team: str) -> np.ndarray:
+        """
+        Rolling averages of a team's latest matches, as used for its next fixture.
+
+        Like the training features, averages are NaN until the team has a full window of matches.
+
+        Args:
+            team: Name of the team
+
+        Returns:
+            Array of averages in the same order as stat_columns
+        """
+        recent = self._recent_stats[team]
+        if len(recent) < self._window:
+            return np.full(len(self.stat_columns), np.nan)
+        return np.mean(recent, axis=0)
+
+    def add_match(self, team: str, stats: Sequence[float]) -> None:
+        """
+        Record a newly played match in the team's recent matches.
+
+        Args:
+            team: Name of the team
+            stats: Match statistics in the same order as stat_columns
+        """
+        recent = self._recent_stats.setdefault(team, deque(maxlen=self._window))
+        recent.append(np.asarray(stats, dtype=np.float64))
 
     def make_predictions(
             self,
@@ -119,21 +297,15 @@ class FootballPredictor:
         Returns:
             Tuple containing predictions DataFrame and precision score
         """
-        # Basic features plus rolling averages
-        predictors = [
-                         "venue_code",
-                         "opp_code",
-                         "hour",
-                         "day_code"
-                     ] + [f"{col}_rolling" for col in self.stat_columns]
+        predictors = list(self.predictors)
 
         # Split data into training and test sets
         train = data[data["date"] < cutoff_date]
         test = data[data["date"] > cutoff_date]  # Fixed from original code where test was same as train
 
         # Train model and make predictions
-        self.rf.fit(train[predictors], train["target"])
-        predictions = self.rf.predict(test[predictors])
+        self.rf.fit(train[predictors].to_numpy(), train["target"].to_numpy())
+        predictions = self.rf.predict(test[predictors].to_numpy())
 
         # Combine predictions with actual results
         results = pd.DataFrame({
@@ -163,15 +335,42 @@ class FootballPredictor:
         Returns:
             DataFrame with standardized team names
         """
-        # Create mapping dictionary that returns original key if not found
-        mapping = type('MissingDict', (dict,), {
-            '__missing__': lambda self, key: key
-        })(self.team_mappings)
-
-        results["new_team"] = results["team"].map(mapping)
+        # Names without a mapping are left unchanged
+        results["new_team"] = results["team"].replace(self.team_mappings)
         return results
 
 
+_memory = Memory(".cache", verbose=0)
+
+
+@_memory.cache
+def _prepare(
+        data_path: str,
+        mtime: float,
+        stat_columns: Tuple[str, ...],
+        window: int,
+        feature_version: int
+) -> pd.DataFrame:
+    """
+    Load a data file and compute its prepared features, cached on disk.
+
+    Every argument is part of the cache key, so editing the data file or
+    bumping FEATURE_VERSION invalidates cached features.
+
+    Args:
+        data_path: Path to the CSV or Parquet file containing match data
+        mtime: Modification time of the data file
+        stat_columns: Statistics to compute rolling averages for
+        window: Number of matches to use for rolling average
+        feature_version: Version of the feature preparation code
+
+    Returns:
+        DataFrame with all features prepared for modeling
+    """
+    matches = FootballPredictor._load_and_clean_data(data_path)
+    return FootballPredictor._compute_features(matches, list(stat_columns), window)
+
+
 def main():
     """
     Main execution function.
@@ -182,11 +381,24 @@ def main():
 
     # Standardize team names and merge for final analysis
     standardized_results = predictor.standardize_team_names(results)
+
+    # Join on integer team codes from one shared categorical rather than on strings
+    teams = pd.CategoricalDtype(pd.unique(pd.concat([
+        standardized_results["new_team"],
+        standardized_results["opponent"]
+    ])))
+    standardized_results["new_team_code"] = standardized_results["new_team"].astype(teams).cat.codes
+    standardized_results["opponent_code"] = standardized_results["opponent"].astype(teams).cat.codes
+    standardized_results["date"] = standardized_results["date"].astype("datetime64[ns]")
+
     final_results = standardized_results.merge(
         standardized_results,
-        left_on=["date", "new_team"],
-        right_on=["date", "opponent"]
-    )
+        left_on=["date", "new_team_code"],
+        right_on=["date", "opponent_code"]
+    ).drop(columns=[
+        "new_team_code_x", "opponent_code_x",
+        "new_team_code_y", "opponent_code_y"
+    ])
 
     print(f"Model Precision: {precision:.3f}")
     return final_results
@@ -1,66 +1,123 @@
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
+from itertools import chain
 import requests
-from bs4 import BeautifulSoup
+import requests_cache
+from requests.adapters import HTTPAdapter
+from lxml import html as lxml_html
+from lxml.cssselect import CSSSelector
 import pandas as pd
-import time
-from typing import List, Optional
+import threading
+from typing import Dict, List, Optional
 
 
 class PremierLeagueScraper:
     BASE_URL = "https://fbref.com"
+    MAX_WORKERS = 4  # Team pages fetched concurrently
+    REQUEST_INTERVAL = 1.0  # Seconds between requests, shared by all workers
+    CACHE_EXPIRY = 86400  # Seconds to reuse cached pages before fetching them again
+
+    # CSS selectors compiled once to XPath and reused for every standings page
+    STANDINGS_TABLE = CSSSelector("table.stats_table")
+    SQUAD_LINKS = CSSSelector("a[href*='/squads/']")
+    PREV_SEASON_LINK = CSSSelector("a.prev")
 
     def __init__(self, start_year: int, end_year: int):
         """
         Initialize the scraper with a range of years and a requests session.
         """
         self.years = list(range(start_year, end_year - 1, -1))
-        self.session = requests.Session()  # Use a session for persistent settings across requests
+        # Use a session for persistent settings across requests, caching responses on disk
+        self.session = requests_cache.CachedSession(
+            'fbref_cache',
+            backend='sqlite',
+            expire_after=self.CACHE_EXPIRY
+        )
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (compatible; PremierLeagueScraper/1.0)'
         })
 
+        # Allow enough pooled connections for the worker threads sharing the session
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # Token bucket holding one request token, refilled by a background thread while scrape runs
+        self._request_tokens = threading.BoundedSemaphore(1)
+        self._stop_refill: Optional[threading.Event] = None
+
+    def _refill_request_tokens(self, stop: threading.Event) -> None:
+        """
+        Releases a request token every REQUEST_INTERVAL seconds until stop is set.
+        """
+        while not stop.wait(self.REQUEST_INTERVAL):
+            try:
+                self._request_tokens.release()
+            except ValueError:
+                pass  # The bucket is already full
+
+    def _get(self, url: str) -> requests.Response:
+        """
+        Fetches a URL, raising on HTTP errors.
+
+        While scrape is running, requests wait for a token from the shared rate limit.
+        """
+        rate_limited = self._stop_refill is not None
+        if rate_limited:
+            self._request_tokens.acquire()
+        response = self.session.get(url)
+
+        # Cached responses never reached fbref, so hand the token back
+        if rate_limited and response.from_cache:
+            try:
+                self._request_tokens.release()
+            except ValueError:
+                pass  # The bucket was refilled in the meantime
+
+        response.raise_for_status()
+        return response
+
     def get_team_urls(self, standings_url: str) -> tuple[List[str], str]:
         """
         Fetches team URLs and the link to the previous season's standings page.
         """
-        response = self.session.get(standings_url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
+        response = self._get(standings_url)
+        tree = lxml_html.fromstring(response.text)
 
         # Find the first table with class 'stats_table' and extract team links
-        standings_table = soup.select('table.stats_table')[0]
-        links = [l.get("href") for l in standings_table.find_all('a')]
-        team_links = [l for l in links if '/squads/' in l]
-        team_urls = [f"{self.BASE_URL}{l}" for l in team_links]
+        standings_table = self.STANDINGS_TABLE(tree)[0]
+        team_urls = [f"{self.BASE_URL}{l.get('href')}" for l in self.SQUAD_LINKS(standings_table)]
 
         # Find the link to the previous season
-        prev_season = soup.select("a.prev")[0].get("href")
+        prev_season = self.PREV_SEASON_LINK(tree)[0].get("href")
         return team_urls, f"{self.BASE_URL}{prev_season}"
 
-    def get_team_data(self, team_url: str, year: int) -> Optional[pd.DataFrame]:
+    def get_team_data(self, team_url: str, year: int) -> Optional[List[Dict]]:
         """
-        Scrapes match and shooting data for a specific team in a given season.
+        Scrapes match and shooting data for a specific team in a given season, one record per match.
         """
         try:
             # Extract the team name from the URL
             team_name = team_url.split("/")[-1].replace("-Stats", "").replace("-", " ")
 
             # Fetch the team's match data
-            response = self.session.get(team_url)
-            response.raise_for_status()
-            matches = pd.read_html(StringIO(response.text), match="Scores & Fixtures")[0]  # Parse match data table
+            response = self._get(team_url)
+            tree = lxml_html.fromstring(response.text)  # Parse the page once for both lookups
+
+            # Parse only the match data table rather than the whole page again
+            match_tables = tree.xpath("//table[contains(string(caption), 'Scores & Fixtures')]")
+            if not match_tables:
+                raise ValueError("No tables found matching 'Scores & Fixtures'")
+            matches = pd.read_html(StringIO(lxml_html.tostring(match_tables[0], encoding="unicode")))[0]
 
-            # Parse the page to find the link to shooting stats
-            soup = BeautifulSoup(response.text, 'html.parser')
-            shooting_links = [l.get("href") for l in soup.find_all('a')
-                              if l and 'all_comps/shooting/' in l.get("href", "")]
+            # Find the link to shooting stats
+            shooting_links = tree.xpath("//a[contains(@href, 'all_comps/shooting/')]/@href")
 
             if not shooting_links:
                 return None
 
             # Fetch the shooting stats
-            shooting_response = self.session.get(f"{self.BASE_URL}{shooting_links[0]}")
-            shooting_response.raise_for_status()
+            shooting_response = self._get(f"{self.BASE_URL}{shooting_links[0]}")
             shooting = pd.read_html(StringIO(shooting_response.text), match="Shooting")[0]
             shooting.columns = shooting.columns.droplevel()  # Drop the multi-index header
 
@@ -75,7 +132,7 @@ class PremierLeagueScraper:
             team_data["Season"] = year
             team_data["Team"] = team_name
 
-            return team_data
+            return team_data.to_dict("records")
 
         except Exception as e:
             print(f"Error processing {team_url}: {str(e)}")
@@ -85,27 +142,50 @@ class PremierLeagueScraper:
         """
         Main method to scrape data for all teams and seasons.
         """
-        all_matches = []
+        all_records = []
         standings_url = f"{self.BASE_URL}/en/comps/9/stats/Premier-League-Stats"
 
-        # Iterate through the years in descending order
-        for year in self.years:
-            print(f"Processing season {year}")
-            team_urls, standings_url = self.get_team_urls(standings_url)  # Get team URLs for the current season
+        # Refill request tokens only for the duration of the scrape
+        self._stop_refill = threading.Event()
+        refill_thread = threading.Thread(
+            target=self._refill_request_tokens,
+            args=(self._stop_refill,),
+            daemon=True
+        )
+        refill_thread.start()
 
-            for team_url in team_urls:
-                team_data = self.get_team_data(team_url, year)
-                if team_data is not None:
-                    all_matches.append(team_data)
-                time.sleep(1)
+        try:
+            with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+                # Iterate through the years in descending order
+                for year in self.years:
+                    print(f"Processing season {year}")
+                    team_urls, standings_url = self.get_team_urls(standings_url)  # Get team URLs for the current season
+
+                    # Fetch the teams concurrently; the request tokens keep the overall rate polite.
+                    # Results are collected in submission order so the output is deterministic
+                    futures = [executor.submit(self.get_team_data, team_url, year) for team_url in team_urls]
+                    for future in futures:
+                        team_records = future.result()
+                        if team_records is not None:
+                            all_records.append(team_records)
+        finally:
+            self._stop_refill.set()
+            refill_thread.join()
+            self._stop_refill = None
 
         # Combine all team data into a single DataFrame
-        match_df = pd.concat(all_matches)
-        match_df.columns = [c.lower() for c in match_df.columns]
-        return match_df
+        match_df = pd.DataFrame.from_records(chain.from_iterable(all_records))
+        return match_df.rename(columns=str.lower)
 
 
 if __name__ == "__main__":
     scraper = PremierLeagueScraper(2023, 2020)
     matches = scraper.scrape()
     matches.to_csv("matches.csv", index=False)
+
+    # Also store a typed copy with the parsing done up front, which loads much faster
+    matches["date"] = pd.to_datetime(matches["date"])
+    matches["hour"] = matches["time"].str.split(":", n=1).str[0].astype("int16")
+    matches["venue"] = matches["venue"].astype("category")
+    matches["opponent"] = matches["opponent"].astype("category")
+    matches.to_parquet("matches.parquet", engine="pyarrow", compression="zstd")